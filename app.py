@@ -1,12 +1,33 @@
 import streamlit as st
-import json
 import os
+import orjson
+import hashlib
+import html
+import contextlib
+import itertools
+import mmap
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import pandas as pd
 import uuid
 from github import Github, GithubException
+from github.GithubRetry import GithubRetry
 
 # --- 設定 ---
 DATA_FILE = 'recipe_data.json'
+SCHEMA_VERSION = 4    # データ形式の版。古い版のファイルだけ _migrate_data で移行する
+COMPACT_EVERY = 50    # ジャーナルにこの件数たまったらスナップショットを書き直す
+PAGE_SIZE = 30        # レシピ一覧の1ページあたりの件数
+LOG_COLLAPSE_AT = 20  # 記録がこの件数を超えたら折りたたんで表示する
+
+# GitHub同期は画面の処理を止めないよう、1本のワーカースレッドで順に行う。
+# スクリプトは再実行のたびにモジュールごと実行し直されるので、
+# モジュール変数ではなくキャッシュに持ち、プロセスで1つだけ作る
+@st.cache_resource
+def _sync_executor():
+    return ThreadPoolExecutor(max_workers=1)
 
 # --- カテゴリ一覧 ---
 DEFAULT_FOLDERS = [
@@ -15,45 +36,237 @@ DEFAULT_FOLDERS = [
     "中華料理", "鍋", "アジア"
 ]
 
+# 表示キャッシュ用の更新番号。マネージャーを作り直しても値が重ならないよう、
+# 再実行で作り直されないキャッシュに置いてプロセス全体で採番する
+@st.cache_resource
+def _revision_counter():
+    return itertools.count(1)
+
+# --- 入力フォームの初期値（空行1行）---
+# スクリプトは再実行のたびにモジュールごと実行し直されるため、
+# 表はキャッシュに1回だけ作っておき、使う側でコピーする
+@st.cache_resource
+def _empty_tables():
+    return {
+        "ingredients": pd.DataFrame({"食材": [""], "分量": [""]}),
+        "seasonings": pd.DataFrame({"調味料": [""], "分量": [""]}),
+        "steps": pd.DataFrame({"手順": [""]}),
+    }
+
+# --- 入力表のカラム設定 ---
+# 再実行のたびに作り直すと入力中の値が消える（IME入力対策）ため、プロセスで1つだけ作る
+@st.cache_resource
+def _cols_config():
+    return {
+        "ingredients": {
+            "食材": st.column_config.TextColumn("食材", width="medium", required=True),
+            "分量": st.column_config.TextColumn("分量", width="small")
+        },
+        "seasonings": {
+            "調味料": st.column_config.TextColumn("調味料", width="medium", required=True),
+            "分量": st.column_config.TextColumn("分量", width="small")
+        }
+    }
+
+# 一覧・検索用DataFrameの列（indexはレシピid）
+INDEX_COLUMNS = ["title", "folder", "rating", "blob_lc"]
+
+# 食材・調味料・作り方の列。v4からは行ごとのdictではなく列ごとのリスト
+# （{"食材": [...], "分量": [...]}）で保存する
+TABLE_COLUMNS = {
+    "ingredients": ["食材", "分量"],
+    "seasonings": ["調味料", "分量"],
+    "steps": ["手順"],
+}
+
 # --- ヘルパー関数: 星の表示 ---
+# 評価は0〜5の6通りしかないので、表示用の文字列をあらかじめ用意しておく
+_STARS = ("ー",) + tuple("★" * n + "☆" * (5 - n) for n in range(1, 6))  # 0 は未評価
+
 def get_star_display(rating):
-    if not rating or rating == 0:
-        return "ー"  # 未評価
-    return "★" * int(rating) + "☆" * (5 - int(rating))
+    return _STARS[int(rating) if rating else 0]
+
+# --- ヘルパー関数: Markdownのエスケープ ---
+# 入力された文字（「2~3本」「$」など）が打ち消し線・数式・リンクにならないよう、記号の前に \ を付ける
+_MD_SPECIAL = re.compile(r'([\\`*_{}\[\]()#+\-.!~$<>|])')
+
+def _md_escape(text):
+    return _MD_SPECIAL.sub(r'\\\1', str(text))
+
+# --- ヘルパー関数: 検索用テキスト ---
+def _search_text(recipe):
+    """料理名と食材名をまとめて小文字化した検索用テキストを返す"""
+    ing_text = " ".join([str(name) for name in recipe["ingredients"].get("食材", [])])
+    # 料理名と食材をまたいだ誤マッチを防ぐため改行で区切る
+    return (recipe["title"] + "\n" + ing_text).lower()
+
+# --- ヘルパー関数: 表 ⇔ 列ごとのリスト ---
+def _clean_columns(df, required_col):
+    """必須列が空の行を除き、列名 → 値のリスト のdictにする。
+    入力欄の表は数行しかないので、pandasの真偽値マスクを使わずPythonで絞り込む"""
+    columns = {col: df[col].tolist() for col in df.columns}
+    keep = [i for i, v in enumerate(columns[required_col]) if pd.notna(v) and str(v).strip()]
+    return {col: [values[i] for i in keep] for col, values in columns.items()}
+
+def _table_columns(table, cols):
+    """v3以前の行ごとのdictのリストを、列ごとのリストに直す（v4の形ならそのまま返す）"""
+    if isinstance(table, dict):
+        return table
+    return {c: [row.get(c, "") for row in table] for c in cols}
+
+def _row_count(table):
+    """列ごとのリストで持つ表の行数"""
+    return len(next(iter(table.values()), []))
+
+# --- ヘルパー関数: JSONファイルの読み込み ---
+def _read_json_file(path):
+    """ファイルをmmapし、Pythonの文字列へコピーせずにorjsonで解析する（空ファイルは None）"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None  # 空ファイルはmmapできない。読み込み側で初期データにする
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
 
 # --- データ管理クラス ---
 class RecipeManager:
     def __init__(self, filename):
         self.filename = filename
+        self.journal_file = os.path.splitext(filename)[0] + "_journal.jsonl"
+        # マネージャーは全セッションで共有するため、変更・書き出しはこのロックで1つずつ行う
+        # （変更メソッドの中から _record / save_data を呼ぶので再入可能なRLockにする）
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._sync_pending = None   # まだ送っていない最新の (content, digest, repo, branch)
+        self._sync_running = False
+        self._remote_sha = None      # 最後に確認したリモートファイルのSHA
+        self._sync_notice = False    # 同期が完了し、まだ画面に知らせていない
+        self._written_hash = None    # 最後に書き出したスナップショットのハッシュ
+        self.synced_hash_file = filename + ".sha"
+        self._synced_hash = self._load_synced_hash()  # 最後にGitHubへ送った内容のハッシュ
+        self.sync_error = None
+        self._suspend = False        # batch() の間は書き出しと同期を後回しにする
+        self._load()
+
+    def _load(self):
+        self._migrated = False
         self.data = self._load_data()
+        self._build_index()
+        # 移行した内容は一度だけ書き出し、次回以降の読み込みでは移行を省く
+        if self._migrated:
+            self.save_data()
+
+    def _build_index(self):
+        """id → レシピ の索引と、一覧・検索用のDataFrameを作る"""
+        recipes = self.data["recipes"]
+        self._by_id = {r["id"]: r for r in recipes}
+        # フォルダ名 → 並び順の位置（存在確認と選択肢の初期位置に使う）
+        self._folder_index = {f: i for i, f in enumerate(self.data["folders"])}
+        self._folder_options = None
+        self._base_revision = next(_revision_counter())
+        self.version = next(_revision_counter())  # データ全体の版。変更のたびに進む
+        self._revisions = {}
+        self._serialized = {}  # id → そのレシピのJSON（変更されたレシピだけ作り直す）
+        # 行ごとのdictではなく列ごとの配列から一度に組み立てる
+        self.df = pd.DataFrame(
+            {
+                "title": [r["title"] for r in recipes],
+                "folder": [r["folder"] for r in recipes],
+                "rating": [r.get("rating", 0) for r in recipes],
+                "blob_lc": [_search_text(r) for r in recipes],
+            },
+            index=pd.Index([r["id"] for r in recipes], name="id"),
+            columns=INDEX_COLUMNS
+        )
+        # 検索列はArrow文字列にして、str.contains をPythonのループでなくArrowの演算で行う
+        self.df["blob_lc"] = self.df["blob_lc"].astype("string[pyarrow]")
+
+    @staticmethod
+    def _df_row(recipe):
+        """1件分の行（INDEX_COLUMNS の順）"""
+        return (recipe["title"], recipe["folder"], recipe.get("rating", 0), _search_text(recipe))
+
+    def folder_options(self):
+        """検索用のフォルダ選択肢（「すべて」+ フォルダ一覧）。フォルダが増えたときだけ作り直す"""
+        if self._folder_options is None:
+            self._folder_options = ["すべて"] + self.data["folders"]
+        return self._folder_options
+
+    def folder_position(self, folder):
+        """フォルダ一覧でのそのフォルダの位置（無ければ0）"""
+        return self._folder_index.get(folder, 0)
+
+    def get_recipe(self, recipe_id):
+        return self._by_id.get(recipe_id)
+
+    def revision(self, recipe_id):
+        """レシピごとの更新回数（表示用キャッシュのキーに使う）"""
+        return self._revisions.get(recipe_id, self._base_revision)
+
+    def _touch(self, recipe_id):
+        self._revisions[recipe_id] = next(_revision_counter())
+        self._serialized.pop(recipe_id, None)
+
+    def search(self, folder, query):
+        """フォルダと検索語で絞り込んだ一覧（id をindexに持つDataFrame）を登録順で返す"""
+        df = self.df
+        mask = pd.Series(True, index=df.index)
+        if folder != "すべて":
+            mask &= df["folder"] == folder
+        if query:
+            mask &= df["blob_lc"].str.contains(query.lower(), regex=False)
+        return df.loc[mask]
+
+    def _file_mtime(self):
+        try:
+            return os.path.getmtime(self.filename)
+        except OSError:
+            return None
+
+    def reload_if_changed(self):
+        """ファイルがアプリの外で更新されていたときだけ読み直す"""
+        with self._lock:
+            if self._file_mtime() == self._loaded_mtime:
+                return False
+            self._load()
+            return True
 
     def _load_data(self):
-        # 1. ローカルファイルの確認
+        data = None
+        self._loaded_mtime = self._file_mtime()
+
+        # 1. ローカルファイル（スナップショット）の確認
         if os.path.exists(self.filename):
             try:
-                with open(self.filename, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self._migrate_data(data)
-                    
-                    # カテゴリの自動更新
-                    current_folders = data.get("folders", [])
-                    for folder in DEFAULT_FOLDERS:
-                        if folder not in current_folders:
-                            current_folders.append(folder)
-                    data["folders"] = current_folders
-                    
-                    return data
-            except json.JSONDecodeError:
-                pass 
+                data = _read_json_file(self.filename)
+            except orjson.JSONDecodeError:
+                data = None
+
+        if data is not None:
+            if data.get("schema_version") != SCHEMA_VERSION:
+                self._migrate_data(data)
+                data["schema_version"] = SCHEMA_VERSION
+                self._migrated = True
+
+            # カテゴリの自動更新（既存の並びを保ったまま、足りない既定フォルダを末尾に追加）
+            current_folders = data.get("folders", [])
+            seen = set(current_folders)
+            data["folders"] = current_folders + [f for f in DEFAULT_FOLDERS if f not in seen]
 
         # 初期データ構造
-        return {
-            "folders": DEFAULT_FOLDERS,
-            "recipes": []
-        }
+        if data is None:
+            data = {
+                "schema_version": SCHEMA_VERSION,
+                "folders": list(DEFAULT_FOLDERS),
+                "recipes": []
+            }
+
+        # 2. スナップショット以降の操作をジャーナルから再生
+        self._replay_journal(data)
+        return data
 
     def _migrate_data(self, data):
         """古い形式のデータを修正する"""
+        old_version = data.get("schema_version", 1)
         for recipe in data.get("recipes", []):
             if isinstance(recipe.get("steps"), str):
                 lines = recipe["steps"].split('\n')
@@ -67,142 +280,573 @@ class RecipeManager:
                 lines = recipe.get("seasonings", "").split('\n')
                 recipe["seasonings"] = [{"調味料": line.strip(), "分量": ""} for line in lines if line.strip()]
             
+            # 以降の処理が型を確認しなくて済むよう、必ずリストにそろえる
+            for key in ("ingredients", "seasonings", "steps", "logs"):
+                if not isinstance(recipe.get(key), (list, dict)):
+                    recipe[key] = []
+
+            # v4から表は列ごとのリストで保存する
+            for key, cols in TABLE_COLUMNS.items():
+                recipe[key] = _table_columns(recipe[key], cols)
+
             if "rating" not in recipe:
                 recipe["rating"] = 0
 
+            # v3から記録は古い順に保存する（追加は末尾へのappend）
+            if old_version < 3:
+                recipe["logs"].reverse()
+
+    # --- 永続化 ---
+    # 変更は1操作1行のジャーナル（JSON Lines）に追記し、
+    # COMPACT_EVERY 件たまったら全体をスナップショットとして書き出す。
+    def _replay_journal(self, data):
+        self._journal_seq = data.get("journal_seq", 0)
+        self._pending_ops = 0
+        if not os.path.exists(self.journal_file):
+            return
+
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    op = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    break  # 書き込み途中で終わった末尾行
+                # スナップショットに反映済みの操作は読み飛ばす
+                if op["seq"] <= self._journal_seq:
+                    continue
+                self._apply_op(data, op)
+                self._journal_seq = op["seq"]
+                self._pending_ops += 1
+        data["journal_seq"] = self._journal_seq
+
+    @staticmethod
+    def _apply_op(data, op):
+        """ジャーナルの1操作を data に適用する（読み込み時のみ使用）"""
+        kind = op["op"]
+        if kind == "add_folder":
+            if op["name"] not in data["folders"]:
+                data["folders"].append(op["name"])
+        elif kind == "add_recipe":
+            recipe = op["recipe"]
+            # 移行前に書かれたジャーナルでも表の形をそろえる
+            for key, cols in TABLE_COLUMNS.items():
+                recipe[key] = _table_columns(recipe.get(key, []), cols)
+            data["recipes"].append(recipe)
+        elif kind == "delete_recipe":
+            data["recipes"] = [r for r in data["recipes"] if r["id"] != op["id"]]
+        else:
+            recipe = next((r for r in data["recipes"] if r["id"] == op["id"]), None)
+            if recipe is None:
+                return
+            if kind == "update_recipe":
+                fields = op["fields"]
+                for key, cols in TABLE_COLUMNS.items():
+                    if key in fields:
+                        fields[key] = _table_columns(fields[key], cols)
+                recipe.update(fields)
+            elif kind == "update_rating":
+                recipe["rating"] = op["rating"]
+            elif kind == "add_log":
+                recipe.setdefault("logs", []).append(op["log"])
+
+    def _record(self, op):
+        """変更操作をジャーナルに追記する"""
+        with self._lock:
+            self.version = next(_revision_counter())
+            self._journal_seq += 1
+            self.data["journal_seq"] = self._journal_seq
+            op["seq"] = self._journal_seq
+            with open(self.journal_file, 'ab') as f:
+                f.write(orjson.dumps(op) + b"\n")
+
+            self._pending_ops += 1
+            if self._suspend:
+                return  # batch() を抜けるときにまとめて書き出す
+            if self._pending_ops >= COMPACT_EVERY:
+                self.save_data()
+
+            self._schedule_sync()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """with manager.batch(): の中の変更は、抜けるときに1回だけ書き出し・同期する"""
+        # 他のセッションの変更が書き出し保留に紛れ込まないよう、抜けるまでロックを持つ
+        with self._lock:
+            if self._suspend:
+                yield  # 入れ子の場合は外側でまとめる
+                return
+            start_seq = self._journal_seq
+            self._suspend = True
+            try:
+                yield
+            finally:
+                self._suspend = False
+                if self._journal_seq != start_seq:
+                    self.save_data()
+                    self._schedule_sync()
+
     def save_data(self):
-        # 1. ローカル保存
-        json_str = json.dumps(self.data, ensure_ascii=False, indent=4)
-        with open(self.filename, 'w', encoding='utf-8') as f:
-            f.write(json_str)
-        
-        # 2. GitHubへ同期
-        if "github" in st.secrets:
-            self._sync_to_github(json_str)
+        """全データをスナップショットとして書き出し、ジャーナルを空にする"""
+        with self._lock:
+            # 1. 前回書き出した内容と同じなら書き込みを省く
+            #    （ファイル側の journal_seq は古いままになるが、この後ジャーナルを空にし、
+            #      以降の操作はそれより大きい番号で記録されるので再生には影響しない）
+            content, content_hash = self._serialize()
+            if content_hash != self._written_hash or not os.path.exists(self.filename):
+                # 一時ファイルに書いてから置き換える（書き込み途中で落ちても壊れない）
+                tmp_file = self.filename + ".tmp"
+                with open(tmp_file, 'wb') as f:
+                    f.write(content)
+                    # 置き換える前に中身をディスクへ確定させる（電源断で空ファイルにならないように）
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.filename)
+                self._written_hash = content_hash
+                self._loaded_mtime = self._file_mtime()  # 自分で書いた分は読み直さない
+
+            # 2. 反映済みのジャーナルを削除
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            self._pending_ops = 0
+
+    def _serialize(self):
+        """保存・同期用のコンパクトなJSON（UTF-8バイト列）と、その内容のハッシュを返す
+
+        journal_seq は操作のたびに進むため、ハッシュには含めない
+        （同じ内容に戻っただけの変更を「変更あり」と見なさないように）。
+        """
+        # 変更のないレシピは前回のバイト列を使い回し、全体はつなぎ合わせて作る
+        cache = self._serialized
+        parts = []
+        for recipe in self.data["recipes"]:
+            part = cache.get(recipe["id"])
+            if part is None:
+                part = cache[recipe["id"]] = orjson.dumps(recipe, option=orjson.OPT_NON_STR_KEYS)
+            parts.append(part)
+        head = orjson.dumps(
+            {k: v for k, v in self.data.items() if k not in ("recipes", "journal_seq")},
+            option=orjson.OPT_NON_STR_KEYS
+        )
+        body = head[:-1] + b',"recipes":[' + b",".join(parts) + b"]}"
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        content = b'{"journal_seq":' + str(self._journal_seq).encode() + b"," + body[1:]
+        return content, digest
+
+    def export_json(self):
+        """人が読む用の整形済みJSON（エクスポート時のみ使用）"""
+        return orjson.dumps(self.data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
 
-    def _sync_to_github(self, content):
+    def _schedule_sync(self):
+        """GitHubへの同期をワーカーに渡す。送信待ちの古い内容は最新のもので置き換える"""
+        # 変更はジャーナルに保存済みなので、同期の設定不備で呼び出し元を失敗させない
         try:
+            if "github" not in st.secrets:
+                return
+
             gh_config = st.secrets["github"]
-            token = gh_config["token"]
-            repo_name = gh_config["repo"]
+            # lazy=True のため通信は発生せず、画面側のスレッドで取得してよい
+            repo = _get_github_repo(gh_config["token"], gh_config["repo"])
             branch = gh_config["branch"]
+        except Exception as e:
+            self.sync_error = str(e)
+            return
+
+        job = (*self._serialize(), repo, branch)
+        with self._sync_lock:
+            self._sync_pending = job
+            if self._sync_running:
+                return  # 実行中のワーカーが続けて送る
+            self._sync_running = True
+        _sync_executor().submit(self._sync_worker)
 
-            g = Github(token)
-            repo = g.get_repo(repo_name)
+    def _sync_worker(self):
+        while True:
+            with self._sync_lock:
+                job = self._sync_pending
+                self._sync_pending = None
+                if job is None:
+                    self._sync_running = False
+                    return
+            self._sync_to_github(*job)
+
+    def _sync_to_github(self, content, digest, repo, branch):
+        # バックグラウンドのスレッドで動くため、結果は sync_error に残して画面側で表示する
+        content_hash = digest.hex()
+        if content_hash == self._synced_hash:
+            return  # 送信済みの内容と同じ
+
+        try:
             remote_file_path = self.filename
 
-            try:
-                contents = repo.get_contents(remote_file_path, ref=branch)
-                repo.update_file(
-                    path=contents.path,
-                    message=f"Update recipe data",
+            # 前回の更新で得たSHAを使い、取得（get_contents）を省く
+            if self._remote_sha is None:
+                self._remote_sha = self._fetch_remote_sha(repo, branch)
+
+            if self._remote_sha is None:
+                result = repo.create_file(
+                    path=remote_file_path,
+                    message=f"Create recipe data",
                     content=content,
-                    sha=contents.sha,
                     branch=branch
                 )
-            except GithubException as e:
-                if e.status == 404:
-                    repo.create_file(
-                        path=remote_file_path,
-                        message=f"Create recipe data",
-                        content=content,
-                        branch=branch
-                    )
-                    st.toast("GitHubに保存しました", icon="🍳")
+            else:
+                try:
+                    result = self._update_remote_file(repo, branch, content)
+                except GithubException as e:
+                    if e.status not in (409, 422):
+                        raise
+                    # 他所で更新されていた（SHAが古い）場合は最新のSHAを取り直して1回だけ再送する
+                    self._remote_sha = self._fetch_remote_sha(repo, branch)
+                    result = self._update_remote_file(repo, branch, content)
+
+            self._remote_sha = result["content"].sha
+            self.sync_error = None
+            self._sync_notice = True
+            self._save_synced_hash(content_hash)
         except Exception as e:
-            st.warning(f"GitHub同期エラー（ローカルには保存されています）: {e}")
+            self._remote_sha = None  # 次回はSHAを取り直す
+            self.sync_error = str(e)
+
+    def _load_synced_hash(self):
+        try:
+            with open(self.synced_hash_file, 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _save_synced_hash(self, content_hash):
+        """送信済みの内容のハッシュを残し、再起動後も同じ内容を送り直さないようにする"""
+        self._synced_hash = content_hash
+        try:
+            with open(self.synced_hash_file, 'w', encoding='utf-8') as f:
+                f.write(content_hash)
+        except OSError:
+            pass
+
+    def pop_sync_notice(self):
+        """前回の表示以降にGitHub同期が完了していれば True を返す（1回だけ）"""
+        notice, self._sync_notice = self._sync_notice, False
+        return notice
+
+    def _fetch_remote_sha(self, repo, branch):
+        """リモートのファイルのSHAを返す（まだ無ければ None）"""
+        try:
+            return repo.get_contents(self.filename, ref=branch).sha
+        except GithubException as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def _update_remote_file(self, repo, branch, content):
+        return repo.update_file(
+            path=self.filename,
+            message=f"Update recipe data",
+            content=content,
+            sha=self._remote_sha,
+            branch=branch
+        )
 
     def add_folder(self, folder_name):
-        if folder_name and folder_name not in self.data["folders"]:
-            self.data["folders"].append(folder_name)
-            self.save_data()
-            return True
-        return False
-
-    def add_recipe(self, title, folder, ingredients_df, seasonings_df, steps_df, rating):
-        steps_list = steps_df.to_dict('records')
-        ingredients_list = ingredients_df.to_dict('records')
-        seasonings_list = seasonings_df.to_dict('records')
-
-        new_recipe = {
-            "id": str(uuid.uuid4()),
-            "title": title,
-            "folder": folder,
-            "ingredients": ingredients_list,
-            "seasonings": seasonings_list,
-            "steps": steps_list,
-            "rating": rating,
-            "logs": []
-        }
-        self.data["recipes"].append(new_recipe)
-        self.save_data()
-
-    def update_recipe(self, recipe_id, title, folder, ingredients_df, seasonings_df, steps_df, rating):
-        """レシピ情報を更新する"""
-        steps_list = steps_df.to_dict('records')
-        ingredients_list = ingredients_df.to_dict('records')
-        seasonings_list = seasonings_df.to_dict('records')
-
-        for i, recipe in enumerate(self.data["recipes"]):
-            if recipe["id"] == recipe_id:
-                # 既存のログは保持する
-                logs = recipe.get("logs", [])
-                
-                updated_recipe = {
-                    "id": recipe_id,
-                    "title": title,
-                    "folder": folder,
-                    "ingredients": ingredients_list,
-                    "seasonings": seasonings_list,
-                    "steps": steps_list,
-                    "rating": rating,
-                    "logs": logs
-                }
-                self.data["recipes"][i] = updated_recipe
-                self.save_data()
+        with self._lock:
+            if folder_name and folder_name not in self._folder_index:
+                self._folder_index[folder_name] = len(self.data["folders"])
+                self._folder_options = None
+                self.data["folders"].append(folder_name)
+                self._record({"op": "add_folder", "name": folder_name})
                 return True
-        return False
+            return False
+
+    def add_recipe(self, title, folder, ingredients, seasonings, steps, rating):
+        with self._lock:
+            new_recipe = {
+                "id": str(uuid.uuid4()),
+                "title": title,
+                "folder": folder,
+                "ingredients": ingredients,
+                "seasonings": seasonings,
+                "steps": steps,
+                "rating": rating,
+                "logs": []
+            }
+            self.data["recipes"].append(new_recipe)
+            self._by_id[new_recipe["id"]] = new_recipe
+            self.df.loc[new_recipe["id"]] = self._df_row(new_recipe)
+            self._record({"op": "add_recipe", "recipe": new_recipe})
+
+    def update_recipe(self, recipe_id, title, folder, ingredients, seasonings, steps, rating):
+        """レシピ情報を更新する（表は _clean_columns で作った列ごとのリスト）"""
+        with self._lock:
+            recipe = self._by_id.get(recipe_id)
+            if recipe is None:
+                return False
+
+            # 一覧の並び順を保つため、同じdictをその場で書き換える（既存のログは保持する）
+            fields = {
+                "title": title,
+                "folder": folder,
+                "ingredients": ingredients,
+                "seasonings": seasonings,
+                "steps": steps,
+                "rating": rating
+            }
+            if all(recipe.get(k) == v for k, v in fields.items()):
+                return True  # 変更なし（保存・同期しない）
+            recipe.update(fields)
+            recipe.setdefault("logs", [])
+            self.df.loc[recipe_id] = self._df_row(recipe)
+            self._touch(recipe_id)
+            self._record({"op": "update_recipe", "id": recipe_id, "fields": fields})
+            return True
     
     def update_rating(self, recipe_id, rating):
-        for recipe in self.data["recipes"]:
-            if recipe["id"] == recipe_id:
-                recipe["rating"] = rating
-                self.save_data()
-                return True
-        return False
+        with self._lock:
+            recipe = self._by_id.get(recipe_id)
+            if recipe is None:
+                return False
+            if recipe.get("rating") == rating:
+                return True  # 変更なし（保存・同期しない）
+            recipe["rating"] = rating
+            self.df.at[recipe_id, "rating"] = rating
+            self._touch(recipe_id)
+            self._record({"op": "update_rating", "id": recipe_id, "rating": rating})
+            return True
 
     def add_log(self, recipe_id, log_text):
-        for recipe in self.data["recipes"]:
-            if recipe["id"] == recipe_id:
-                log_entry = {
-                    "date": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M"),
-                    "text": log_text
-                }
-                recipe["logs"].insert(0, log_entry)
-                self.save_data()
-                return True
-        return False
+        with self._lock:
+            recipe = self._by_id.get(recipe_id)
+            if recipe is None:
+                return False
+            log_entry = {
+                "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "text": log_text
+            }
+            recipe["logs"].append(log_entry)  # 古い順に保存し、表示時に新しい順へ並べる
+            self._touch(recipe_id)
+            self._record({"op": "add_log", "id": recipe_id, "log": log_entry})
+            return True
 
     def delete_recipe(self, recipe_id):
-        self.data["recipes"] = [r for r in self.data["recipes"] if r["id"] != recipe_id]
-        self.save_data()
+        with self._lock:
+            if self._by_id.pop(recipe_id, None) is None:
+                return
+            self._serialized.pop(recipe_id, None)
+            self.df = self.df.drop(recipe_id)
+            # _by_id は一覧と同じ順に並んでいるので、そのまま並べ直せばよい
+            self.data["recipes"] = list(self._by_id.values())
+            self._record({"op": "delete_recipe", "id": recipe_id})
+
+# --- 一覧表示用DataFrameのキャッシュ ---
+# manager はハッシュせず、データの版（version）と絞り込み条件をキーにする。
+# 版が進むと古いエントリは二度と使われないので、件数に上限を設けて捨てる
+@st.cache_data(max_entries=16)
+def _recipe_table(version, folder, query, sort_order, _manager):
+    filtered = _manager.search(folder, query)
+
+    # ソート処理
+    if sort_order == "登録が新しい順":
+        filtered = filtered.iloc[::-1]
+    elif sort_order == "登録が古い順":
+        pass
+    elif sort_order == "評価が高い順":
+        filtered = filtered.sort_values("rating", ascending=False, kind="stable")
+    elif sort_order == "評価が低い順":
+        filtered = filtered.sort_values("rating", kind="stable")
+
+    # カテゴリは種類が少ないのでcategory型にする（並びはフォルダ一覧の順）
+    categories = list(dict.fromkeys(_manager.data["folders"] + filtered["folder"].unique().tolist()))
+
+    # index（レシピid）は選択行からレシピを引くために残す
+    return pd.DataFrame({
+        "料理名": filtered["title"],
+        "カテゴリ": pd.Categorical(filtered["folder"], categories=categories),
+        "評価": [get_star_display(r) for r in filtered["rating"].tolist()]
+    }, index=filtered.index)
+
+# --- 詳細表示用の表（Markdown）---
+# 表示だけの小さな表は st.dataframe（グリッド部品）を使わずMarkdownで描く
+
+def _md_cell(value):
+    if value is None or value != value:  # None / NaN
+        return ""
+    return _md_escape(value).replace("\n", " ")
+
+def _md_table(table, cols, numbered=False):
+    header = (["#"] if numbered else []) + cols
+    lines = [
+        "| " + " | ".join(header) + " |",
+        "|" + "---|" * len(header)
+    ]
+    n = _row_count(table)
+    columns = [table.get(c) or [""] * n for c in cols]
+    for i, row in enumerate(zip(*columns), start=1):
+        cells = ([str(i)] if numbered else []) + [_md_cell(v) for v in row]
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+# レシピidと更新回数をキーにし、内容が変わったときだけ作り直す
+# （更新前のエントリは使われなくなるので、件数に上限を設ける）
+@st.cache_data(max_entries=64)
+def _table_markdown(recipe_id, revision, field, _table):
+    return _md_table(_table, TABLE_COLUMNS[field], numbered=(field == "steps"))
+
+# --- 編集フォーム用DataFrameのキャッシュ ---
+# 編集するレシピは一度に1件なので、直近の分だけ残す
+@st.cache_data(max_entries=16)
+def _editor_df(recipe_id, revision, field, _table):
+    if not _row_count(_table):
+        return _empty_tables()[field].copy()
+    # 列ごとのリストなので、そのまま列として渡せる
+    return pd.DataFrame(_table)
+
+# --- GitHubリポジトリのキャッシュ ---
+# クライアントを保存のたびに作り直さないようにする。
+# lazy=True なのでリポジトリ情報の取得（REST呼び出し）も行わない。
+# 再試行は既定の GithubRetry（5xxやレート制限を待って再送）のまま、回数だけ減らす。
+# （retry に整数を渡すと接続エラーしか再試行しなくなる）
+@st.cache_resource
+def _get_github_repo(token, repo_name):
+    return Github(token, per_page=1, retry=GithubRetry(total=3)).get_repo(repo_name, lazy=True)
+
+# --- マネージャーのキャッシュ ---
+# 再実行のたびにJSONを読み直さないよう、プロセス内で1つのインスタンスを共有する。
+# 各メソッドは self.data をその場で更新するため、キャッシュ側にも変更が反映される。
+@st.cache_resource
+def get_manager(path):
+    return RecipeManager(path)
+
+# --- 記録（ログ）欄 ---
+# 記録の追加で再実行されるのはこの欄だけにする（一覧や検索は再実行しない）
+@st.fragment
+def log_section(manager, recipe_id):
+    recipe = manager.get_recipe(recipe_id)
+
+    with st.form(key=f"log_form_{recipe_id}"):
+        col_log, col_btn = st.columns([4, 1])
+        with col_log:
+            new_log = st.text_input("気づき・メモを追加", placeholder="例: 次は塩を少し減らす", key=f"input_{recipe_id}")
+        with col_btn:
+            submit_log = st.form_submit_button("記録")
+        
+        # 下の一覧はこの後に描画するので、追加した記録はそのまま表示される（rerun不要）
+        if submit_log and new_log:
+            manager.add_log(recipe_id, new_log)
+            st.success("記録しました")
+
+    if recipe['logs']:
+        # ログ1件ごとに要素を送らず、まとめて1回で描画する
+        # （1つのHTMLになるので、< などを含む記録が後ろの記録を崩さないようエスケープする）
+        logs_html = "".join(
+            f'<div class="log-box"><small>{html.escape(log["date"])}</small> : {html.escape(log["text"])}</div>'
+            for log in reversed(recipe['logs'])
+        )
+        if len(recipe['logs']) > LOG_COLLAPSE_AT:
+            with st.expander(f"記録 ({len(recipe['logs'])}件)"):
+                st.markdown(logs_html, unsafe_allow_html=True)
+        else:
+            st.markdown(logs_html, unsafe_allow_html=True)
+
+# --- 新規レシピ登録フォーム ---
+# 入力や保存で再実行されるのはこのフォームだけにする
+@st.fragment
+def new_recipe_form(manager):
+    form_key = st.session_state.form_reset_id
+    
+    # 入力用DataFrameの初期化
+    if f"ing_df_{form_key}" not in st.session_state:
+        st.session_state[f"ing_df_{form_key}"] = _empty_tables()["ingredients"].copy()
+    
+    if f"sea_df_{form_key}" not in st.session_state:
+        st.session_state[f"sea_df_{form_key}"] = _empty_tables()["seasonings"].copy()
+        
+    if f"stp_df_{form_key}" not in st.session_state:
+        st.session_state[f"stp_df_{form_key}"] = _empty_tables()["steps"].copy()
+
+    with st.form(key=f"add_recipe_form_{form_key}"):
+        col_basic1, col_basic2, col_basic3 = st.columns([2, 1, 1])
+        with col_basic1:
+            title = st.text_input("料理名 (必須)")
+        with col_basic2:
+            folder = st.selectbox("カテゴリ", manager.data["folders"])
+        with col_basic3:
+            rating = st.selectbox(
+                "評価", 
+                options=[0, 1, 2, 3, 4, 5],
+                format_func=lambda x: "未評価" if x==0 else "★" * x
+            )
+
+        # 3つの表はタブに分け、一度に並べて表示しない
+        tab_ing, tab_sea, tab_stp = st.tabs(["🥕 食材リスト", "🧂 調味料リスト", "🔥 作り方"])
+        
+        with tab_ing:
+            st.caption("※入力後はTabキーで分量へ移動")
+            edited_ingredients = st.data_editor(
+                st.session_state[f"ing_df_{form_key}"],
+                num_rows="dynamic",
+                use_container_width=True,
+                key=f"editor_ingredients_{form_key}",
+                column_config=_cols_config()["ingredients"]
+            )
+
+        with tab_sea:
+            st.caption("※入力後はTabキーで分量へ移動")
+            edited_seasonings = st.data_editor(
+                st.session_state[f"sea_df_{form_key}"],
+                num_rows="dynamic",
+                use_container_width=True,
+                key=f"editor_seasonings_{form_key}",
+                column_config=_cols_config()["seasonings"]
+            )
+        
+        with tab_stp:
+            st.caption("下に行を追加して手順を入力してください。")
+            edited_steps = st.data_editor(
+                st.session_state[f"stp_df_{form_key}"],
+                num_rows="dynamic",
+                use_container_width=True,
+                key=f"editor_steps_{form_key}"
+            )
+        
+        submitted = st.form_submit_button("レシピを保存する")
+        
+        if submitted:
+            if title:
+                clean_ingredients = _clean_columns(edited_ingredients, "食材")
+                clean_seasonings = _clean_columns(edited_seasonings, "調味料")
+                clean_steps = _clean_columns(edited_steps, "手順")
+                
+                if not _row_count(clean_steps):
+                     st.error("作り方を1つ以上入力してください。")
+                else:
+                    manager.add_recipe(title, folder, clean_ingredients, clean_seasonings, clean_steps, rating)
+                    st.success(f"「{title}」を保存しました！")
+                    # 使い終わったフォームの初期値は消しておく（セッションに溜めない）
+                    for prefix in ("ing_df", "sea_df", "stp_df"):
+                        st.session_state.pop(f"{prefix}_{form_key}", None)
+                    st.session_state.form_reset_id += 1
+                    st.rerun()
+            else:
+                st.error("料理名は必須です。")
+
+# --- 画面の固定設定 ---
+_CSS = """
+<style>
+.log-box {
+    background-color: #fff5f5;
+    padding: 10px;
+    border-radius: 5px;
+    margin-bottom: 8px;
+    border-left: 5px solid #ff6b6b;
+}
+.stDataFrame { margin-top: 5px; margin-bottom: 10px; }
+</style>
+"""
 
 # --- アプリケーション本体 ---
 def main():
     st.set_page_config(page_title="My Cooking Lab", layout="wide", page_icon="🍳")
     
-    st.markdown("""
-    <style>
-    .log-box {
-        background-color: #fff5f5;
-        padding: 10px;
-        border-radius: 5px;
-        margin-bottom: 8px;
-        border-left: 5px solid #ff6b6b;
-    }
-    .stDataFrame { margin-top: 5px; margin-bottom: 10px; }
-    </style>
-    """, unsafe_allow_html=True)
+    # 出力しなかった要素は画面から消えるため、CSSは再実行のたびに出す（文字列は定数）
+    st.markdown(_CSS, unsafe_allow_html=True)
 
     st.title("🍳 My Cooking Lab (料理研究ノート)")
     
@@ -211,22 +855,22 @@ def main():
         st.session_state.form_reset_id = 0
     if "editing_recipe_id" not in st.session_state:
         st.session_state.editing_recipe_id = None
-        
-    # カラム設定の固定化（IME入力対策）
-    if "cols_config" not in st.session_state:
-        st.session_state.cols_config = {
-            "ingredients": {
-                "食材": st.column_config.TextColumn("食材", width="medium", required=True),
-                "分量": st.column_config.TextColumn("分量", width="small")
-            },
-            "seasonings": {
-                "調味料": st.column_config.TextColumn("調味料", width="medium", required=True),
-                "分量": st.column_config.TextColumn("分量", width="small")
-            }
-        }
 
-    manager = RecipeManager(DATA_FILE)
+    manager = get_manager(DATA_FILE)
+    manager.reload_if_changed()
+    if manager.pop_sync_notice():
+        st.toast("GitHubに保存しました", icon="🍳")
+    if manager.sync_error:
+        st.sidebar.warning(f"GitHub同期エラー（ローカルには保存されています）: {manager.sync_error}")
     menu = st.sidebar.radio("メニュー", ["レシピ一覧・検索", "新規レシピ登録", "フォルダ管理"])
+    # 整形済みJSONはボタンが押されたときだけ生成する
+    st.sidebar.download_button(
+        "📥 データをエクスポート",
+        data=manager.export_json,
+        file_name=DATA_FILE,
+        mime="application/json",
+        on_click="ignore"  # ダウンロードだけなので画面全体を再実行しない
+    )
 
     # ---------------------------------------------------------
     # 1. レシピ一覧・検索
@@ -234,68 +878,48 @@ def main():
     if menu == "レシピ一覧・検索":
         st.header("📖 レシピを探す")
 
-        col_search1, col_search2, col_sort = st.columns([1.5, 2, 1.5])
-        with col_search1:
-            folder_options = ["すべて"] + manager.data["folders"]
-            selected_folder = st.selectbox("📂 フォルダ", folder_options)
-        with col_search2:
-            search_query = st.text_input("🔍 食材・料理名で検索", placeholder="例: 豚肉, カレー")
+        if "search_folder" not in st.session_state:
+            st.session_state.search_folder = "すべて"
+        if "search_query" not in st.session_state:
+            st.session_state.search_query = ""
+
+        col_search, col_sort = st.columns([3.5, 1.5])
+        with col_search:
+            # 1文字ごとに再実行されないよう、検索条件はフォームでまとめて確定する
+            with st.form("search_form"):
+                col_search1, col_search2 = st.columns([1.5, 2])
+                with col_search1:
+                    folder_input = st.selectbox("📂 フォルダ", manager.folder_options())
+                with col_search2:
+                    query_input = st.text_input("🔍 食材・料理名で検索", placeholder="例: 豚肉, カレー")
+                if st.form_submit_button("検索"):
+                    st.session_state.search_folder = folder_input
+                    st.session_state.search_query = query_input
+        selected_folder = st.session_state.search_folder
+        search_query = st.session_state.search_query
         with col_sort:
             sort_order = st.selectbox(
                 "🔃 並び替え", 
                 ["登録が新しい順", "評価が高い順", "評価が低い順", "登録が古い順"]
             )
 
-        # フィルタリング
-        filtered_recipes = []
-        for r in manager.data["recipes"]:
-            is_folder_match = (selected_folder == "すべて") or (r["folder"] == selected_folder)
-            
-            is_word_match = True
-            if search_query:
-                query = search_query.lower()
-                in_title = query in r["title"].lower()
-                
-                ing_data = r.get("ingredients", [])
-                ing_text = ""
-                if isinstance(ing_data, list):
-                    ing_text = " ".join([str(item.get("食材", "")) for item in ing_data])
-                else:
-                    ing_text = str(ing_data)
-                
-                in_ingredients = query in ing_text.lower()
-                is_word_match = in_title or in_ingredients
-            
-            if is_folder_match and is_word_match:
-                filtered_recipes.append(r)
-
-        # ソート処理
-        if sort_order == "登録が新しい順":
-            filtered_recipes.reverse()
-        elif sort_order == "登録が古い順":
-            pass
-        elif sort_order == "評価が高い順":
-            filtered_recipes.sort(key=lambda x: x.get("rating", 0), reverse=True)
-        elif sort_order == "評価が低い順":
-            filtered_recipes.sort(key=lambda x: x.get("rating", 0))
+        # フィルタリング・ソート（データと条件が同じならキャッシュを使う）
+        df_display = _recipe_table(manager.version, selected_folder, search_query, sort_order, manager)
 
-        if not filtered_recipes:
+        if df_display.empty:
             st.info("条件に合うレシピが見つかりません。")
         else:
-            display_data = []
-            for r in filtered_recipes:
-                display_data.append({
-                    "料理名": r["title"],
-                    "カテゴリ": r["folder"],
-                    "評価": get_star_display(r.get("rating", 0))
-                })
-                
-            df_display = pd.DataFrame(display_data)
-            
+            # 件数が多くても表示・送信する行数が増えないよう、ページに分ける
+            page_count = (len(df_display) - 1) // PAGE_SIZE + 1
+            page = 1
+            if page_count > 1:
+                page = st.number_input(f"ページ（全{page_count}ページ・{len(df_display)}件）", min_value=1, max_value=page_count, value=1, step=1)
+            df_page = df_display.iloc[(page - 1) * PAGE_SIZE : page * PAGE_SIZE]
+
             st.write("▼ レシピを選択して詳細を表示")
             
             event = st.dataframe(
-                df_display,
+                df_page,
                 use_container_width=True,
                 hide_index=True,
                 selection_mode="single-row",
@@ -304,7 +928,7 @@ def main():
 
             if event.selection.rows:
                 selected_index = event.selection.rows[0]
-                recipe = filtered_recipes[selected_index]
+                recipe = manager.get_recipe(df_page.index[selected_index])
 
                 st.markdown("---")
 
@@ -314,15 +938,16 @@ def main():
                     
                     with st.form(key=f"edit_form_{recipe['id']}"):
                         # 既存データをDataFrameに変換
-                        df_ing = pd.DataFrame(recipe['ingredients']) if recipe['ingredients'] else pd.DataFrame([{"食材": "", "分量": ""}])
-                        df_sea = pd.DataFrame(recipe['seasonings']) if recipe['seasonings'] else pd.DataFrame([{"調味料": "", "分量": ""}])
-                        df_stp = pd.DataFrame(recipe['steps']) if recipe['steps'] else pd.DataFrame([{"手順": ""}])
+                        revision = manager.revision(recipe['id'])
+                        df_ing = _editor_df(recipe['id'], revision, "ingredients", recipe['ingredients'])
+                        df_sea = _editor_df(recipe['id'], revision, "seasonings", recipe['seasonings'])
+                        df_stp = _editor_df(recipe['id'], revision, "steps", recipe['steps'])
 
                         ec1, ec2, ec3 = st.columns([2, 1, 1])
                         with ec1:
                             e_title = st.text_input("料理名", value=recipe['title'])
                         with ec2:
-                            e_folder = st.selectbox("カテゴリ", manager.data["folders"], index=manager.data["folders"].index(recipe['folder']) if recipe['folder'] in manager.data["folders"] else 0)
+                            e_folder = st.selectbox("カテゴリ", manager.data["folders"], index=manager.folder_position(recipe['folder']))
                         with ec3:
                             e_rating = st.selectbox("評価", [0,1,2,3,4,5], index=recipe.get('rating', 0), format_func=lambda x: "未評価" if x==0 else "★"*x)
 
@@ -333,7 +958,7 @@ def main():
                                 df_ing, 
                                 num_rows="dynamic", 
                                 use_container_width=True,
-                                column_config=st.session_state.cols_config["ingredients"],
+                                column_config=_cols_config()["ingredients"],
                                 key=f"edit_ing_{recipe['id']}"
                             )
                         with ec_r:
@@ -342,7 +967,7 @@ def main():
                                 df_sea, 
                                 num_rows="dynamic", 
                                 use_container_width=True,
-                                column_config=st.session_state.cols_config["seasonings"],
+                                column_config=_cols_config()["seasonings"],
                                 key=f"edit_sea_{recipe['id']}"
                             )
 
@@ -363,9 +988,9 @@ def main():
                         if submit_update:
                             if e_title:
                                 # クリーニング
-                                c_ing = e_ingredients[e_ingredients["食材"].notna() & (e_ingredients["食材"] != "")]
-                                c_sea = e_seasonings[e_seasonings["調味料"].notna() & (e_seasonings["調味料"] != "")]
-                                c_stp = e_steps[e_steps["手順"].notna() & (e_steps["手順"] != "")]
+                                c_ing = _clean_columns(e_ingredients, "食材")
+                                c_sea = _clean_columns(e_seasonings, "調味料")
+                                c_stp = _clean_columns(e_steps, "手順")
                                 
                                 manager.update_recipe(recipe['id'], e_title, e_folder, c_ing, c_sea, c_stp, e_rating)
                                 st.success("レシピを更新しました！")
@@ -396,51 +1021,23 @@ def main():
                         st.rerun()
 
                     col1, col2 = st.columns([1, 1.2])
+                    revision = manager.revision(recipe['id'])
                     
                     with col1:
                         st.markdown("### 🥕 食材")
-                        if isinstance(recipe.get('ingredients'), list):
-                            st.dataframe(pd.DataFrame(recipe['ingredients']), use_container_width=True, hide_index=True)
-                        else:
-                            st.text(recipe.get('ingredients', ''))
+                        st.markdown(_table_markdown(recipe['id'], revision, "ingredients", recipe['ingredients']))
                             
                         st.markdown("### 🧂 調味料")
-                        if isinstance(recipe.get('seasonings'), list):
-                            st.dataframe(pd.DataFrame(recipe['seasonings']), use_container_width=True, hide_index=True)
-                        else:
-                            st.text(recipe.get('seasonings', ''))
+                        st.markdown(_table_markdown(recipe['id'], revision, "seasonings", recipe['seasonings']))
                     
                     with col2:
                         st.markdown("### 🔥 作り方")
-                        if isinstance(recipe.get('steps'), list):
-                            steps_df = pd.DataFrame(recipe['steps'])
-                            steps_df.index = steps_df.index + 1
-                            st.dataframe(steps_df, use_container_width=True)
-                        else:
-                            st.text(recipe.get('steps', ''))
+                        st.markdown(_table_markdown(recipe['id'], revision, "steps", recipe['steps']))
 
                     st.markdown("---")
                     st.subheader("📝 試行錯誤・気づきの記録 (PDCA)")
                     
-                    with st.form(key=f"log_form_{recipe['id']}"):
-                        col_log, col_btn = st.columns([4, 1])
-                        with col_log:
-                            new_log = st.text_input("気づき・メモを追加", placeholder="例: 次は塩を少し減らす", key=f"input_{recipe['id']}")
-                        with col_btn:
-                            submit_log = st.form_submit_button("記録")
-                        
-                        if submit_log and new_log:
-                            manager.add_log(recipe['id'], new_log)
-                            st.success("記録しました")
-                            st.rerun()
-
-                    if recipe['logs']:
-                        for log in recipe['logs']:
-                            st.markdown(f"""
-                            <div class="log-box">
-                                <small>{log['date']}</small> : {log['text']}
-                            </div>
-                            """, unsafe_allow_html=True)
+                    log_section(manager, recipe['id'])
                     
                     with st.expander("設定・削除"):
                         if st.button("このレシピを削除する", key=f"del_{recipe['id']}"):
@@ -453,88 +1050,7 @@ def main():
     elif menu == "新規レシピ登録":
         st.header("✍️ 新規レシピ登録")
 
-        form_key = st.session_state.form_reset_id
-        
-        # 入力用DataFrameの初期化
-        if f"ing_df_{form_key}" not in st.session_state:
-            st.session_state[f"ing_df_{form_key}"] = pd.DataFrame([{"食材": "", "分量": ""}], columns=["食材", "分量"])
-        
-        if f"sea_df_{form_key}" not in st.session_state:
-            st.session_state[f"sea_df_{form_key}"] = pd.DataFrame([{"調味料": "", "分量": ""}], columns=["調味料", "分量"])
-            
-        if f"stp_df_{form_key}" not in st.session_state:
-            st.session_state[f"stp_df_{form_key}"] = pd.DataFrame([{"手順": ""}])
-
-        with st.form(key=f"add_recipe_form_{form_key}"):
-            col_basic1, col_basic2, col_basic3 = st.columns([2, 1, 1])
-            with col_basic1:
-                title = st.text_input("料理名 (必須)")
-            with col_basic2:
-                folder = st.selectbox("カテゴリ", manager.data["folders"])
-            with col_basic3:
-                rating = st.selectbox(
-                    "評価", 
-                    options=[0, 1, 2, 3, 4, 5],
-                    format_func=lambda x: "未評価" if x==0 else "★" * x
-                )
-
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("### 🥕 食材リスト")
-                st.caption("※入力後はTabキーで分量へ移動")
-                edited_ingredients = st.data_editor(
-                    st.session_state[f"ing_df_{form_key}"],
-                    num_rows="dynamic",
-                    use_container_width=True,
-                    key=f"editor_ingredients_{form_key}",
-                    column_config=st.session_state.cols_config["ingredients"]
-                )
-
-            with col2:
-                st.markdown("### 🧂 調味料リスト")
-                st.caption("※入力後はTabキーで分量へ移動")
-                edited_seasonings = st.data_editor(
-                    st.session_state[f"sea_df_{form_key}"],
-                    num_rows="dynamic",
-                    use_container_width=True,
-                    key=f"editor_seasonings_{form_key}",
-                    column_config=st.session_state.cols_config["seasonings"]
-                )
-            
-            st.markdown("### 🔥 作り方")
-            st.caption("下に行を追加して手順を入力してください。")
-            
-            edited_steps = st.data_editor(
-                st.session_state[f"stp_df_{form_key}"],
-                num_rows="dynamic",
-                use_container_width=True,
-                key=f"editor_steps_{form_key}"
-            )
-            
-            submitted = st.form_submit_button("レシピを保存する")
-            
-            if submitted:
-                if title:
-                    clean_ingredients = edited_ingredients[
-                        edited_ingredients["食材"].notna() & (edited_ingredients["食材"] != "")
-                    ]
-                    clean_seasonings = edited_seasonings[
-                        edited_seasonings["調味料"].notna() & (edited_seasonings["調味料"] != "")
-                    ]
-                    clean_steps = edited_steps[
-                        edited_steps["手順"].notna() & (edited_steps["手順"] != "")
-                    ]
-                    
-                    if clean_steps.empty:
-                         st.error("作り方を1つ以上入力してください。")
-                    else:
-                        manager.add_recipe(title, folder, clean_ingredients, clean_seasonings, clean_steps, rating)
-                        st.success(f"「{title}」を保存しました！")
-                        st.session_state.form_reset_id += 1
-                        st.rerun()
-                else:
-                    st.error("料理名は必須です。")
+        new_recipe_form(manager)
 
     # ---------------------------------------------------------
     # 3. フォルダ管理
@@ -542,8 +1058,7 @@ def main():
     elif menu == "フォルダ管理":
         st.header("📂 カテゴリフォルダ管理")
         
-        df_folders = pd.DataFrame(manager.data["folders"], columns=["フォルダ名"])
-        st.dataframe(df_folders, hide_index=True)
+        st.markdown("\n".join(f"- {_md_escape(f)}" for f in manager.data["folders"]))
         
         with st.form("add_folder_form"):
             new_folder_name = st.text_input("新しいフォルダ名を追加")